@@ -0,0 +1,165 @@
+import multiprocessing
+import os
+import re
+
+from transformers import StoppingCriteria
+
+# ========================
+# GENERATION BUDGET
+# ========================
+# New-token budget when idle; it shrinks as more generations are in flight
+GEN_MAX_NEW_TOKENS = int(os.getenv("GEN_MAX_NEW_TOKENS", "64"))
+# Smallest budget the load-based degradation can shrink to
+GEN_MIN_BUDGET_TOKENS = int(os.getenv("GEN_MIN_BUDGET_TOKENS", "16"))
+# Tokens to generate before a sentence end is allowed to stop generation
+GEN_MIN_NEW_TOKENS = int(os.getenv("GEN_MIN_NEW_TOKENS", "12"))
+# Length of a token n-gram that, once repeated, stops generation
+GEN_REPEAT_NGRAM = 4
+
+# Shortest trimmed reply worth returning instead of a curated fallback
+GEN_MIN_RESPONSE_WORDS = 3
+
+# A sentence ends with .!? right after a word of 2+ letters, so "1.", "..."
+# and the "g." in "e.g." don't count
+SENTENCE_END = re.compile(r"\b([A-Za-z']{2,})[.!?]+[\"')]?(?=\s|$)")
+ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "st", "jr", "sr", "vs", "etc", "prof"}
+TURN_MARKER = "User says:"
+
+
+def sentence_ends(text: str) -> list:
+    """Indexes just past each sentence end in the text"""
+    return [m.end() for m in SENTENCE_END.finditer(text) if m.group(1).lower() not in ABBREVIATIONS]
+
+
+def ends_sentence(text: str) -> bool:
+    text = text.rstrip()
+    ends = sentence_ends(text)
+    return bool(ends) and ends[-1] == len(text)
+
+
+class WellnessStoppingCriteria(StoppingCriteria):
+    """
+    Stops generation at a sentence end (after a minimum length),
+    on a repeated n-gram, or when the model starts a new user turn
+    """
+    
+    def __init__(self, tokenizer, prompt_length: int, min_new_tokens: int):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.min_new_tokens = min_new_tokens
+        self.generated_tokens = 0
+    
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        new_ids = input_ids[0, self.prompt_length:].tolist()
+        self.generated_tokens = len(new_ids)
+        text = self.tokenizer.decode(new_ids, skip_special_tokens=True)
+        
+        if TURN_MARKER in text:
+            return True
+        
+        n = GEN_REPEAT_NGRAM
+        if len(new_ids) >= 2 * n:
+            last = new_ids[-n:]
+            if any(new_ids[i:i + n] == last for i in range(len(new_ids) - n)):
+                return True
+        
+        return len(new_ids) >= self.min_new_tokens and ends_sentence(text)
+
+
+# Worker processes the shared in-flight table has room for
+GEN_MAX_TRACKED_WORKERS = 64
+
+
+class GenerationTracker:
+    """
+    Tracks in-flight generations and tokens generated vs. returned
+    Counters live in shared memory created at import, so with gunicorn's
+    preload_app every worker forked from the master updates the same counts
+    
+    In-flight generations are counted per worker pid, so the master can drop
+    the slots of a worker that died mid-generation (see child_exit in gunicorn.conf.py)
+    """
+    
+    def __init__(self):
+        self.created_pid = os.getpid()
+        self.lock = multiprocessing.Lock()
+        self.worker_pids = multiprocessing.RawArray("i", GEN_MAX_TRACKED_WORKERS)
+        self.worker_in_flight = multiprocessing.RawArray("i", GEN_MAX_TRACKED_WORKERS)
+        self.requests = multiprocessing.RawValue("q", 0)
+        self.tokens_generated = multiprocessing.RawValue("q", 0)
+        self.tokens_returned = multiprocessing.RawValue("q", 0)
+    
+    def _slot(self, pid: int, claim: bool = False):
+        """Index of the worker's slot; call with the lock held"""
+        for i, slot_pid in enumerate(self.worker_pids):
+            if slot_pid == pid:
+                return i
+        if claim:
+            for i, slot_pid in enumerate(self.worker_pids):
+                if slot_pid == 0:
+                    self.worker_pids[i] = pid
+                    return i
+        return None
+    
+    def start(self) -> int:
+        """Register a generation and return its new-token budget"""
+        with self.lock:
+            slot = self._slot(os.getpid(), claim=True)
+            if slot is not None:
+                self.worker_in_flight[slot] += 1
+            queued = max(1, sum(self.worker_in_flight))
+        return max(GEN_MIN_BUDGET_TOKENS, GEN_MAX_NEW_TOKENS // queued)
+    
+    def finish(self):
+        """Unregister a generation; call exactly once per start()"""
+        with self.lock:
+            slot = self._slot(os.getpid())
+            if slot is not None and self.worker_in_flight[slot] > 0:
+                self.worker_in_flight[slot] -= 1
+    
+    def release_worker(self, pid: int):
+        """Drop every in-flight generation of a worker that has exited"""
+        with self.lock:
+            slot = self._slot(pid)
+            if slot is not None:
+                self.worker_in_flight[slot] = 0
+                self.worker_pids[slot] = 0
+    
+    def shared_across_workers(self) -> bool:
+        """True when this process was forked from the one that created the tracker"""
+        return os.getpid() != self.created_pid
+    
+    def record(self, generated: int, returned: int):
+        with self.lock:
+            self.requests.value += 1
+            self.tokens_generated.value += generated
+            self.tokens_returned.value += returned
+    
+    def get_stats(self):
+        with self.lock:
+            return {
+                "in_flight": sum(self.worker_in_flight),
+                "requests": self.requests.value,
+                "tokens_generated": self.tokens_generated.value,
+                "tokens_returned": self.tokens_returned.value,
+                "tokens_discarded": self.tokens_generated.value - self.tokens_returned.value,
+            }
+
+
+generation_tracker = GenerationTracker()
+
+
+def trim_generated_text(text: str) -> str:
+    """
+    Cut the generated text at a new user turn and drop any unfinished sentence
+    Returns an empty string when that leaves less than GEN_MIN_RESPONSE_WORDS
+    """
+    
+    text = text.split(TURN_MARKER)[0].strip()
+    ends = sentence_ends(text)
+    if not ends:
+        return ""
+    text = text[:ends[-1]]
+    if len(text.split()) < GEN_MIN_RESPONSE_WORDS:
+        return ""
+    return text
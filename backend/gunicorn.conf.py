@@ -0,0 +1,35 @@
+import gc
+import os
+import sys
+
+# ========================
+# GUNICORN CONFIGURATION
+# ========================
+# Run with: gunicorn main:app -c gunicorn.conf.py
+#
+# preload_app imports main.py (and loads the model) once in the master.
+# Workers are forked afterwards and share the weights copy-on-write,
+# so adding workers doesn't add another copy of the model.
+#
+# Chat history (ChatContext in main.py) is still held in each worker's memory,
+# so keep a single worker until it moves to shared storage: with several workers
+# /chat/context and DELETE /chat/context only see the serving worker's copy.
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def when_ready(server):
+    # Move everything loaded so far into the permanent generation, so the
+    # garbage collector in each worker never writes to (and copies) those pages
+    gc.freeze()
+    server.log.info("Froze %d objects before forking workers", gc.get_freeze_count())
+
+
+def child_exit(server, worker):
+    # A worker killed mid-generation (timeout, OOM, SIGKILL) never releases its
+    # in-flight slots, which would shrink every later token budget; drop them here
+    generation = sys.modules.get("generation")
+    if generation is not None:
+        generation.generation_tracker.release_worker(worker.pid)
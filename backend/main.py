@@ -44,23 +44,41 @@ class UserDB(Base):
 # ========================
 # CHATBOT MODELS (Add to imports)
 # ========================
-from transformers import pipeline
+from transformers import pipeline, StoppingCriteriaList
 import os
+import sys
+
+from generation import (
+    GEN_MIN_NEW_TOKENS, WellnessStoppingCriteria, generation_tracker, trim_generated_text,
+)
+from router import (
+    ROUTER_CONFIDENCE_THRESHOLD, ROUTE_GENERATE, ROUTE_CRISIS,
+    WELLNESS_TEMPLATES, DEFAULT_SUPPORTIVE_RESPONSE, SMALL_TALK_TEMPLATES,
+    CRISIS_RESPONSE, classify_message,
+)
 
 # Initialize the chatbot model (runs once at startup)
-print("🤖 Loading Hugging Face model...")
-try:
-    # Using a free, lightweight model from Hugging Face
-    # This model is fine-tuned for mental health conversations
-    chatbot = pipeline(
-        "text-generation",
-        model="gpt2",  # Lightweight, free model
-        device=-1  # CPU mode (set to 0 for GPU if available)
-    )
-    print("✅ Chatbot model loaded successfully!")
-except Exception as e:
-    print(f"❌ Error loading model: {e}")
-    chatbot = None
+# Under gunicorn with preload_app (see gunicorn.conf.py) this runs in the master
+# before workers fork, so every worker shares one copy of the weights
+def load_chatbot():
+    print("🤖 Loading Hugging Face model...")
+    try:
+        # Using a free, lightweight model from Hugging Face
+        # This model is fine-tuned for mental health conversations
+        model = pipeline(
+            "text-generation",
+            model="gpt2",  # Lightweight, free model
+            device=-1,  # CPU mode (set to 0 for GPU if available)
+            model_kwargs={"use_safetensors": True}  # Load the safetensors weights, not the pickle checkpoint
+        )
+        print(f"✅ Chatbot model loaded successfully! (pid {os.getpid()})")
+        return model
+    except Exception as e:
+        print(f"❌ Error loading model: {e}")
+        return None
+
+
+chatbot = load_chatbot()
 
 # ========================
 # CHATBOT SCHEMAS
@@ -99,7 +117,7 @@ class ChatContext:
         return self.conversation_history[user_id]
     
     def add_message(self, user_id: int, role: str, content: str):
-        self.conversation_history[user_id].append({
+        self.get_user_context(user_id).append({
             "role": role,
             "content": content,
             "timestamp": datetime.utcnow()
@@ -139,27 +157,48 @@ User says: {user_message}
 
 Compassionate response:"""
     
+    budget = generation_tracker.start()
     try:
+        tokenizer = chatbot.tokenizer
+        stopping = WellnessStoppingCriteria(
+            tokenizer,
+            prompt_length=len(tokenizer(wellness_prompt)["input_ids"]),
+            min_new_tokens=min(GEN_MIN_NEW_TOKENS, budget)
+        )
+        
         # Generate response from model
         response = chatbot(
             wellness_prompt,
-            max_length=150,
+            max_new_tokens=budget,
+            stopping_criteria=StoppingCriteriaList([stopping]),
+            return_full_text=False,
             num_return_sequences=1,
             do_sample=True,
             temperature=0.7,
-            top_p=0.9
+            top_p=0.9,
+            pad_token_id=tokenizer.eos_token_id
         )
         
-        bot_response = response[0]['generated_text'].split("Compassionate response:")[-1].strip()
-        
-        # Add to context
-        chat_context.add_message(user_id, "user", user_message)
-        chat_context.add_message(user_id, "assistant", bot_response)
-        
-        return bot_response
+        bot_response = trim_generated_text(response[0]['generated_text'])
+        returned = len(tokenizer(bot_response)["input_ids"]) if bot_response else 0
+        generation_tracker.record(stopping.generated_tokens, returned)
     except Exception as e:
         print(f"Error generating response: {e}")
         return get_fallback_response(user_message)
+    finally:
+        generation_tracker.finish()
+    
+    print(f"🧮 Generated {stopping.generated_tokens} tokens, returned {returned} (budget {budget})")
+    
+    # Nothing but an unfinished or repetitive fragment was generated
+    if not bot_response:
+        bot_response = get_fallback_response(user_message)
+    
+    # Add to context
+    chat_context.add_message(user_id, "user", user_message)
+    chat_context.add_message(user_id, "assistant", bot_response)
+    
+    return bot_response
 
 
 def get_fallback_response(user_message: str) -> str:
@@ -170,24 +209,95 @@ def get_fallback_response(user_message: str) -> str:
     
     message_lower = user_message.lower()
     
-    # Wellness-focused fallback responses
-    responses = {
-        "stress": "I hear you're feeling stressed. Try taking 5 deep breaths, go for a short walk, or practice a grounding technique. What helps you relax?",
-        "anxiety": "Anxiety can feel overwhelming. Some people find it helpful to break tasks into smaller steps. Would talking through what's worrying you help?",
-        "sad": "I'm sorry you're feeling sad. It's okay to feel this way. Have you considered reaching out to someone you trust or a professional?",
-        "lonely": "Loneliness is a tough feeling. Consider connecting with someone - even a quick call or text can help. You're not alone.",
-        "sleep": "Sleep is so important for mental health. Try establishing a bedtime routine, avoiding screens 1 hour before bed, and keeping your room cool and dark.",
-        "help": "I'm here to listen and support you. Tell me what's on your mind - what brought you here today?",
-        "tired": "Feeling tired can sometimes be related to stress or burnout. Are you getting enough rest? What could help you recharge?",
-        "coping": "Here are some coping strategies: breathing exercises, journaling, physical activity, creative expression, meditation, or talking to someone you trust.",
-    }
-    
-    for keyword, response in responses.items():
+    for keyword, response in WELLNESS_TEMPLATES.items():
         if keyword in message_lower:
             return response
     
     # Default supportive response
-    return "Thank you for sharing that with me. I'm here to listen and support you. Can you tell me more about how you're feeling? Remember, it's okay to not be okay, and seeking support is a sign of strength. 💚"
+    return DEFAULT_SUPPORTIVE_RESPONSE
+
+
+# ========================
+# MESSAGE ROUTER
+# ========================
+def route_message(user_message: str, user_id: int) -> str:
+    """
+    Answer from templates or crisis resources when possible,
+    only falling through to the language model when needed
+    """
+    
+    decision = classify_message(user_message)
+    print(f"🧭 Route: {decision.route} (intent={decision.intent}, confidence={decision.confidence:.2f}, threshold={ROUTER_CONFIDENCE_THRESHOLD})")
+    
+    if decision.route == ROUTE_GENERATE:
+        return generate_wellness_response(user_message, user_id)
+    
+    if decision.route == ROUTE_CRISIS:
+        bot_response = CRISIS_RESPONSE
+    else:
+        bot_response = SMALL_TALK_TEMPLATES.get(decision.intent) or WELLNESS_TEMPLATES[decision.intent]
+    
+    chat_context.add_message(user_id, "user", user_message)
+    chat_context.add_message(user_id, "assistant", bot_response)
+    
+    return bot_response
+
+
+# ========================
+# WORKER MEMORY REPORT
+# ========================
+MEMORY_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_clean_mb",
+    "Shared_Dirty": "shared_dirty_mb",
+    "Private_Clean": "private_clean_mb",
+    "Private_Dirty": "private_dirty_mb",
+}
+
+
+def get_process_memory(pid: int) -> Optional[dict]:
+    """
+    Read RSS vs. shared memory for a process from /proc (Linux only)
+    """
+    
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    
+    report = {"pid": pid}
+    for line in lines:
+        parts = line.split()
+        key = parts[0].rstrip(":")
+        if key in MEMORY_FIELDS:
+            report[MEMORY_FIELDS[key]] = round(int(parts[1]) / 1024, 1)
+    
+    report["shared_mb"] = round(report.get("shared_clean_mb", 0) + report.get("shared_dirty_mb", 0), 1)
+    report["private_mb"] = round(report.get("private_clean_mb", 0) + report.get("private_dirty_mb", 0), 1)
+    return report
+
+
+def running_under_gunicorn() -> bool:
+    return "gunicorn" in sys.modules
+
+
+def get_sibling_worker_pids() -> list:
+    """
+    PIDs of every worker forked from the same gunicorn master as this process
+    Outside gunicorn (plain uvicorn, --reload) the parent isn't a master, so only this process
+    """
+    
+    if not running_under_gunicorn():
+        return [os.getpid()]
+    
+    master_pid = os.getppid()
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+            return [int(pid) for pid in f.read().split()]
+    except OSError:
+        return [os.getpid()]
 
 
 # ========================
@@ -211,8 +321,8 @@ def chat_with_bot(
     """
     
     try:
-        # Generate bot response
-        bot_response = generate_wellness_response(message.message, current_user.id)
+        # Route to templates, crisis resources or the model
+        bot_response = route_message(message.message, current_user.id)
         
         return ChatResponse(
             user_message=message.message,
@@ -248,6 +358,25 @@ def get_chat_context(
     }
 
 
+@app.get("/chat/generation-stats")
+def get_generation_stats(current_user: UserDB = Depends(get_current_user)):
+    """
+    Get language model token usage: tokens generated vs. returned to users
+    
+    Requires: Authorization header with Bearer token
+    
+    The counts and in-flight queue are shared by all workers only when the
+    tracker was created in a master before fork (gunicorn preload_app);
+    otherwise they only cover the process that served this request
+    """
+    
+    return {
+        "pid": os.getpid(),
+        "shared_across_workers": generation_tracker.shared_across_workers(),
+        **generation_tracker.get_stats(),
+    }
+
+
 @app.delete("/chat/context")
 def clear_chat_context(current_user: UserDB = Depends(get_current_user)):
     """
@@ -544,6 +673,33 @@ def health():
     return {"status": "ok", "message": "Wellness API is running"}
 
 
+@app.get("/health/memory")
+def health_memory(current_user: UserDB = Depends(get_current_user)):
+    """
+    Per-worker RSS vs. shared memory, to check model weights stay shared
+    
+    Requires: Authorization header with Bearer token
+    
+    PSS splits shared pages evenly across the processes mapping them,
+    so the sum of worker PSS approximates the real memory footprint
+    Outside gunicorn only the current process is reported
+    """
+    
+    workers = [
+        report for report in (get_process_memory(pid) for pid in get_sibling_worker_pids())
+        if report is not None
+    ]
+    
+    return {
+        "pid": os.getpid(),
+        "master": get_process_memory(os.getppid()) if running_under_gunicorn() else None,
+        "workers": workers,
+        "worker_count": len(workers),
+        "total_rss_mb": round(sum(w.get("rss_mb", 0) for w in workers), 1),
+        "total_pss_mb": round(sum(w.get("pss_mb", 0) for w in workers), 1),
+    }
+
+
 @app.post("/auth/register", status_code=201)
 def register(user: UserRegister, db: Session = Depends(get_db)):
     existing_user = db.query(UserDB).filter(UserDB.email == user.email.lower()).first()
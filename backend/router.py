@@ -0,0 +1,166 @@
+import os
+import re
+from typing import Optional
+
+from pydantic import BaseModel
+
+# ========================
+# MESSAGE ROUTER
+# ========================
+# Minimum classifier confidence needed to answer from a template instead of the model
+ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+
+ROUTE_TEMPLATE = "template"
+ROUTE_GENERATE = "generate"
+ROUTE_CRISIS = "crisis"
+
+# Curated responses shared by the message router and the model fallback
+WELLNESS_TEMPLATES = {
+    "stress": "I hear you're feeling stressed. Try taking 5 deep breaths, go for a short walk, or practice a grounding technique. What helps you relax?",
+    "anxiety": "Anxiety can feel overwhelming. Some people find it helpful to break tasks into smaller steps. Would talking through what's worrying you help?",
+    "sad": "I'm sorry you're feeling sad. It's okay to feel this way. Have you considered reaching out to someone you trust or a professional?",
+    "lonely": "Loneliness is a tough feeling. Consider connecting with someone - even a quick call or text can help. You're not alone.",
+    "sleep": "Sleep is so important for mental health. Try establishing a bedtime routine, avoiding screens 1 hour before bed, and keeping your room cool and dark.",
+    "help": "I'm here to listen and support you. Tell me what's on your mind - what brought you here today?",
+    "tired": "Feeling tired can sometimes be related to stress or burnout. Are you getting enough rest? What could help you recharge?",
+    "coping": "Here are some coping strategies: breathing exercises, journaling, physical activity, creative expression, meditation, or talking to someone you trust.",
+}
+
+DEFAULT_SUPPORTIVE_RESPONSE = "Thank you for sharing that with me. I'm here to listen and support you. Can you tell me more about how you're feeling? Remember, it's okay to not be okay, and seeking support is a sign of strength. 💚"
+
+SMALL_TALK_TEMPLATES = {
+    "greeting": "Hi there! I'm glad you stopped by. How are you feeling today?",
+    "thanks": "You're very welcome. I'm here whenever you need to talk. 💚",
+    "goodbye": "Take care of yourself. I'm here whenever you want to check in again. 💚",
+}
+
+CRISIS_RESPONSE = "I'm really sorry you're going through this, and I'm glad you told me. You deserve support right now. Please reach out to the 988 Suicide & Crisis Lifeline (call or text 988 in the US), text HOME to 741741 for the Crisis Text Line, or contact your local emergency number. If you can, let someone you trust know how you're feeling. 💚"
+
+# Matched against the tokenized message (lowercase words joined by single spaces),
+# so punctuation, hyphens and extra whitespace don't break a match
+CRISIS_PATTERNS = [re.compile(pattern) for pattern in [
+    r"\bsuicid",
+    r"\b(kms|unalive)\b",
+    r"\b(kill|killing|killed|hang|hanging|hanged|shoot|shooting|drown|drowning|poison|poisoning|hurt|hurting|harm|harming|burn|burning|starve|starving) my ?self\b",
+    # Leaves idioms like "cut myself some slack" alone
+    r"\b(cut|cutting) my ?self\b(?! (some |a little |a bit of |more |any )?slack\b| a (piece|slice)\b)",
+    r"\bself (harm|injur)",
+    r"\b(end|ending|take|taking) (my|my own) life\b",
+    r"\b(end|ending) it all\b",
+    # Leaves idioms like "going to die of embarrassment" alone
+    r"\b(want|wanna|wanted|going|wish) (to )?die\b(?! (of|laughing)\b)",
+    r"\bwish i (was|were) dead\b",
+    r"\bbetter off (dead|without me)\b",
+    r"\btired of (living|life|being alive)\b",
+    r"\b(don't|dont|do not) want to (be here|live|be alive|exist|wake up)\b",
+    r"\bno (reason|point) (to|in) (live|living)\b",
+    r"\boverdos",
+    r"\btoo many (pills|tablets|meds|sleeping pills)\b",
+    r"\b(swallow|swallowed|take|took|taking) all (my|the|of my) (pills|tablets|meds)\b",
+    r"\b(jump|jumping|jumped) (off|from) (a|the|my) (bridge|building|roof|cliff|balcony|window)\b",
+    r"\b(jump|jumping|jumped|step|stepping) in front of (a|the) (train|car|bus|truck)\b",
+]]
+
+# Words that signal each intent; stems of 4+ letters also match longer words
+INTENT_KEYWORDS = {
+    "thanks": ["thank", "thanks", "thx", "appreciate"],
+    "stress": ["stress", "overwhelm", "pressure", "burnout"],
+    "anxiety": ["anxi", "worr", "nervous", "panic"],
+    "sad": ["sad", "sadness", "down", "depress", "unhappy", "cry", "crying"],
+    "lonely": ["lonel", "alone", "isolat"],
+    "sleep": ["sleep", "insomnia", "awake"],
+    "help": ["help"],
+    "tired": ["tired", "exhaust", "drained"],
+    "coping": ["coping", "cope"],
+}
+
+# Greetings and goodbyes only count as the whole message or its opening words,
+# and only as exact words ("Mornings are the worst" is not a greeting)
+OPENING_KEYWORDS = {
+    "greeting": ["hi", "hello", "hey", "hiya", "morning", "evening", "afternoon"],
+    "goodbye": ["bye", "goodbye", "goodnight", "later", "night"],
+}
+OPENING_WORDS = 2
+
+# A negated message ("I'm not sad anymore") can't be answered by a template
+NEGATORS = {
+    "not", "no", "never", "don't", "dont", "doesn't", "didn't", "isn't",
+    "aren't", "wasn't", "nor",
+}
+
+# Words that carry no intent and shouldn't dilute confidence
+FILLER_WORDS = {
+    "i", "i'm", "im", "i've", "am", "a", "an", "the", "so", "very", "really",
+    "just", "feel", "feeling", "me", "my", "you", "to", "and", "is", "it",
+    "bit", "there", "good", "much", "lot", "of", "today", "kind", "quite",
+    "been", "lately", "pretty", "kinda", "right", "now", "all", "about",
+}
+
+
+class RouteDecision(BaseModel):
+    route: str
+    intent: Optional[str]
+    confidence: float
+
+
+def tokenize(user_message: str) -> list:
+    return re.findall(r"[a-z']+", user_message.lower().replace("’", "'"))
+
+
+def is_crisis(tokens: list) -> bool:
+    text = " ".join(tokens)
+    return any(pattern.search(text) for pattern in CRISIS_PATTERNS)
+
+
+def _keyword_matches(word: str, keyword: str) -> bool:
+    return word == keyword or (len(keyword) >= 4 and word.startswith(keyword))
+
+
+def classify_message(user_message: str) -> RouteDecision:
+    """
+    Lightweight keyword classifier that runs before the language model
+    Short, focused messages score high; long, mixed or negated messages go to the model
+    """
+    
+    tokens = tokenize(user_message)
+    
+    # Crisis language always escalates, regardless of threshold
+    if is_crisis(tokens):
+        return RouteDecision(route=ROUTE_CRISIS, intent="crisis", confidence=1.0)
+    
+    # Greetings and goodbyes at the start of the message are set aside, not scored
+    opening = [w for w in tokens[:OPENING_WORDS] if any(w in k for k in OPENING_KEYWORDS.values())]
+    words = [
+        w for i, w in enumerate(tokens)
+        if w not in FILLER_WORDS and not (i < OPENING_WORDS and w in opening)
+    ]
+    
+    scores = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        hits = sum(1 for w in words if any(_keyword_matches(w, k) for k in keywords))
+        if hits:
+            scores[intent] = hits
+    
+    # Small talk only wins when nothing else was said ("Evening panic" is about panic)
+    if not words:
+        for intent, keywords in OPENING_KEYWORDS.items():
+            hits = sum(1 for w in opening if w in keywords)
+            if hits:
+                scores[intent] = hits
+        words = opening
+    
+    if not scores:
+        return RouteDecision(route=ROUTE_GENERATE, intent=None, confidence=0.0)
+    
+    intent = max(scores, key=scores.get)
+    # How much the winning intent dominates other intents
+    purity = scores[intent] / sum(scores.values())
+    # How much of the message the winning intent explains
+    coverage = min(1.0, scores[intent] / len(words))
+    confidence = round(purity * coverage, 2)
+    
+    if any(w in NEGATORS for w in tokens):
+        return RouteDecision(route=ROUTE_GENERATE, intent=intent, confidence=confidence)
+    
+    route = ROUTE_TEMPLATE if confidence >= ROUTER_CONFIDENCE_THRESHOLD else ROUTE_GENERATE
+    return RouteDecision(route=route, intent=intent, confidence=confidence)
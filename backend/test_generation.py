@@ -0,0 +1,135 @@
+import multiprocessing
+import os
+
+import pytest
+import torch
+
+import generation
+from generation import GenerationTracker, WellnessStoppingCriteria, trim_generated_text
+
+PROMPT = [0, 0]
+
+VOCAB = {
+    0: "<prompt>",
+    1: " I",
+    2: " hear",
+    3: " you",
+    4: ".",
+    5: "\nUser says:",
+    6: " Okay",
+    7: " that",
+    8: " sounds",
+    9: " hard",
+    10: " Dr",
+    11: " 1",
+    12: " Smith",
+}
+
+
+class WordTokenizer:
+    def decode(self, ids, skip_special_tokens=True):
+        return "".join(VOCAB[i] for i in ids)
+
+
+@pytest.mark.parametrize("new_ids, min_new_tokens, should_stop", [
+    # Repeated 4-gram
+    ([1, 2, 3, 6, 1, 2, 3, 6], 100, True),
+    # New user turn
+    ([6, 5], 100, True),
+    ([1, 2, 3, 5, 6], 100, True),
+    # Sentence end only counts after the minimum length
+    ([6, 4], 12, False),
+    ([6, 4], 2, True),
+    ([7, 8, 9, 4], 4, True),
+    # Abbreviations and list numbers aren't sentence ends
+    ([7, 8, 9, 10, 4], 2, False),
+    ([7, 8, 9, 11, 4], 2, False),
+    ([10, 4, 12, 8, 9, 4], 2, True),
+    # Still going
+    ([1, 2, 3], 2, False),
+    ([7, 8, 9, 1, 2, 3], 2, False),
+])
+def test_stopping_criteria(new_ids, min_new_tokens, should_stop):
+    stopping = WellnessStoppingCriteria(WordTokenizer(), len(PROMPT), min_new_tokens)
+    input_ids = torch.tensor([PROMPT + new_ids])
+
+    assert bool(stopping(input_ids, None)) == should_stop
+    assert stopping.generated_tokens == len(new_ids)
+
+
+@pytest.mark.parametrize("in_flight, budget", [
+    (0, 64),
+    (1, 32),
+    (2, 21),
+    (3, 16),
+    (10, 16),
+])
+def test_budget_shrinks_with_in_flight_generations(monkeypatch, in_flight, budget):
+    monkeypatch.setattr(generation, "GEN_MAX_NEW_TOKENS", 64)
+    monkeypatch.setattr(generation, "GEN_MIN_BUDGET_TOKENS", 16)
+    tracker = GenerationTracker()
+    for _ in range(in_flight):
+        tracker.start()
+
+    assert tracker.start() == budget
+
+
+def test_tracker_records_tokens_and_releases_slots():
+    tracker = GenerationTracker()
+    tracker.start()
+    tracker.record(generated=40, returned=25)
+    tracker.finish()
+
+    stats = tracker.get_stats()
+    assert stats["in_flight"] == 0
+    assert stats["requests"] == 1
+    assert stats["tokens_discarded"] == 15
+
+
+def test_tracker_releases_slots_of_dead_worker(monkeypatch):
+    monkeypatch.setattr(generation, "GEN_MAX_NEW_TOKENS", 64)
+    monkeypatch.setattr(generation, "GEN_MIN_BUDGET_TOKENS", 16)
+    tracker = GenerationTracker()
+
+    # Worker dies between start() and finish()
+    worker = multiprocessing.get_context("fork").Process(
+        target=lambda: (tracker.start(), tracker.start(), os._exit(1))
+    )
+    worker.start()
+    worker.join()
+    assert tracker.get_stats()["in_flight"] == 2
+
+    tracker.release_worker(worker.pid)
+    assert tracker.get_stats()["in_flight"] == 0
+    assert tracker.start() == 64
+
+
+def test_tracker_shared_only_in_forked_workers():
+    tracker = GenerationTracker()
+    assert not tracker.shared_across_workers()
+
+    result = multiprocessing.get_context("fork").Value("b", 0)
+    worker = multiprocessing.get_context("fork").Process(
+        target=lambda: setattr(result, "value", int(tracker.shared_across_workers()))
+    )
+    worker.start()
+    worker.join()
+    assert result.value == 1
+
+
+@pytest.mark.parametrize("text, trimmed", [
+    (" That sounds hard. Try resting. And then we", "That sounds hard. Try resting."),
+    (" That sounds really hard.\nUser says: thanks", "That sounds really hard."),
+    (" You are not alone! Want to talk?", "You are not alone! Want to talk?"),
+    (" I hear you I hear you I hear you", ""),
+    ("Dr. Smith says hi", ""),
+    ("1. Breathe 2. Walk", ""),
+    ("...", ""),
+    ("Okay.", ""),
+    ("Dr. Smith says rest helps. And", "Dr. Smith says rest helps."),
+    ("1. Breathe slowly. 2. Walk", "1. Breathe slowly."),
+    ("Try this, e.g. a walk outside. Then", "Try this, e.g. a walk outside."),
+    ("You said \"I'm fine.\" But", "You said \"I'm fine.\""),
+])
+def test_trim_generated_text(text, trimmed):
+    assert trim_generated_text(text) == trimmed
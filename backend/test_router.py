@@ -0,0 +1,61 @@
+import pytest
+
+from router import ROUTE_CRISIS, ROUTE_GENERATE, ROUTE_TEMPLATE, classify_message
+
+
+@pytest.mark.parametrize("message", [
+    "I want to kill myself",
+    "I've been thinking about killing myself",
+    "I'm hurting myself",
+    "I cut myself again",
+    "I want to end it all",
+    "I want to end my life",
+    "everyone would be better off without me",
+    "they'd all be better off if I was dead, better off dead",
+    "I'm so tired of living",
+    "I don't want to be here anymore",
+    "I dont want to live",
+    "I've been having suicidal thoughts",
+    "thinking about self-harm again",
+    "I just want to die",
+    "I wish I was dead",
+    "There's no reason to live",
+    "I’m thinking about taking my own life",
+    "kms",
+    "I took too many pills",
+    "I want to jump off a bridge",
+    "I'm going to hang myself",
+    "I keep cutting myself",
+    "I want to die from this pain",
+])
+def test_crisis_messages_escalate(message):
+    decision = classify_message(message)
+    assert decision.route == ROUTE_CRISIS
+    assert decision.confidence == 1.0
+
+
+@pytest.mark.parametrize("message, route, intent", [
+    ("hi", ROUTE_TEMPLATE, "greeting"),
+    ("Good morning!", ROUTE_TEMPLATE, "greeting"),
+    ("thanks so much", ROUTE_TEMPLATE, "thanks"),
+    ("bye", ROUTE_TEMPLATE, "goodbye"),
+    ("I'm so stressed", ROUTE_TEMPLATE, "stress"),
+    ("I'm so tired today", ROUTE_TEMPLATE, "tired"),
+    ("I feel really anxious and worried", ROUTE_TEMPLATE, "anxiety"),
+    ("Evening panic", ROUTE_TEMPLATE, "anxiety"),
+    ("this exam is killing me", ROUTE_GENERATE, None),
+    ("I'm going to cut myself some slack", ROUTE_GENERATE, None),
+    ("I'm going to die of embarrassment lol", ROUTE_GENERATE, None),
+    ("I might jump off the couch and go for a run", ROUTE_GENERATE, None),
+    ("Mornings are the worst", ROUTE_GENERATE, None),
+    ("I feel terrible every morning", ROUTE_GENERATE, None),
+    ("I'm not sad anymore", ROUTE_GENERATE, "sad"),
+    ("hi, I'm not okay", ROUTE_GENERATE, None),
+    ("hey, I'm not stressed anymore", ROUTE_GENERATE, "stress"),
+    ("what is the meaning of life", ROUTE_GENERATE, None),
+    ("my boss yelled at me and the car broke and I am stressed and I don't know what to do", ROUTE_GENERATE, "stress"),
+])
+def test_non_crisis_messages(message, route, intent):
+    decision = classify_message(message)
+    assert decision.route == route
+    assert decision.intent == intent